@@ -17,6 +17,10 @@ from typing import Any, List
 DEFAULT_VELOCITY = 64
 DEFAULT_QPM = 120
 
+# integer tags for telling temporal features apart without type checks
+TIME_SIGNATURE_KIND = 0
+TEMPO_KIND = 1
+
 ##################################################
 
 
@@ -74,6 +78,7 @@ class Tempo(muspy.classes.Tempo):
 
     _attributes = OrderedDict([("time", int), ("qpm", (float, int)), ("text", str), ("measure", int)])
     _optional_attributes = ["qpm", "text", "measure"]
+    _KIND = TEMPO_KIND
 
     def __init__(self, time: int, qpm: float = DEFAULT_QPM, text: str = "", measure: int = None):
         super().__init__(time = time, qpm = qpm)
@@ -133,6 +138,7 @@ class TimeSignature(muspy.classes.TimeSignature):
 
     _attributes = OrderedDict([("time", int), ("measure", int), ("numerator", int), ("denominator", int)])
     _optional_attributes = ["measure"]
+    _KIND = TIME_SIGNATURE_KIND
 
     def __init__(self, time: int, numerator: int = 4, denominator: int = 4, measure: int = None):
         super().__init__(time = time, numerator = numerator, denominator = denominator)
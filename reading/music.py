@@ -17,10 +17,13 @@
 
 import muspy
 from collections import OrderedDict
-from typing import List
-from re import sub
+from itertools import chain
+from typing import List, Union
+import re
 import yaml # for printing
 import json
+import orjson
+import msgpack
 import gzip
 import utils
 import numpy as np
@@ -43,21 +46,46 @@ from output import write_midi, write_audio, write_musicxml, get_expressive_featu
 
 DIVIDE_BY_ZERO_CONSTANT = 1e-10
 
+# types that to_dict() returns as is, or converts to lists
+BASE_TYPES = frozenset((bool, str, int, float, type(None)))
+SEQUENCE_TYPES = frozenset((list, tuple, set))
+
+# fields of a note, which are stored column-wise in .msgpack files
+NOTE_FIELDS = ("time", "pitch", "duration", "velocity", "pitch_str", "is_grace", "measure")
+
+# whether objects of a given type have a given attribute ({attribute: {type: bool}}), memoized by has_attribute(); keyed on the type itself rather than a fixed set of classes, since classes.py can be imported under more than one module name (e.g. `classes` and `reading.classes`)
+HAS_ATTRIBUTE = {"duration": dict(), "annotation": dict()}
+
+# yaml dumper for printing; use the C-accelerated one when libyaml is available (the safe dumpers cannot represent our classes)
+YAML_DUMPER = getattr(yaml, "CDumper", yaml.Dumper)
+YAML_PYTHON_OBJECT_TAG_PATTERN = re.compile(pattern = "!!python/object:.*classes.") # precompiled, as it is applied to every attribute when printing
+
 ##################################################
 
 
 # HELPER FUNCTIONS
 ##################################################
 
+def has_attribute(obj, attribute: str) -> bool:
+    """Memoized hasattr(), by the type of the object, since hasattr is slow when the attribute is missing."""
+    cache = HAS_ATTRIBUTE.setdefault(attribute, dict())
+    has = cache.get(type(obj))
+    if has is None:
+        has = cache[type(obj)] = hasattr(obj, attribute)
+    return has
+
 def to_dict(obj) -> dict:
     """Convert an object into a dictionary (for .json output)."""
 
+    # check the exact type first, since a set lookup is much cheaper than a chain of isinstance() calls
+    obj_type = type(obj)
+
     # base case
-    if isinstance(obj, bool) or isinstance(obj, str) or isinstance(obj, int) or isinstance(obj, float) or obj is None:
+    if (obj_type in BASE_TYPES) or isinstance(obj, (bool, str, int, float)):
         return obj
 
     # deal with lists
-    elif isinstance(obj, list) or isinstance(obj, tuple) or isinstance(obj, set):
+    elif (obj_type in SEQUENCE_TYPES) or isinstance(obj, (list, tuple, set)):
         return [to_dict(obj = value) for value in obj]
     
     # deal with dictionaries
@@ -66,7 +94,40 @@ def to_dict(obj) -> dict:
 
     # deal with objects
     else:
-        return {key: to_dict(obj = value) for key, value in ([("name", obj.__class__.__name__)] + list(vars(obj).items()))}
+        return {"name": obj.__class__.__name__, **{key: to_dict(obj = value) for key, value in vars(obj).items()}}
+
+def to_dict_orjson(obj) -> dict:
+    """The `default` argument to `orjson.dumps()` (for .json output). orjson serializes built-in types itself in C, calling this function for any other object and serializing what it returns, so there is no need for to_dict()."""
+
+    # deal with sets
+    if isinstance(obj, set):
+        return list(obj)
+
+    # deal with objects
+    return {"name": obj.__class__.__name__, **vars(obj)}
+
+def to_dict_msgpack(obj) -> dict:
+    """The `default` argument to `msgpack.packb()` (for .msgpack output). Same as to_dict_orjson(), except that the notes of a track are stored column-wise (a list of values for each field), so that they are packed as tight arrays without repeating field names."""
+
+    # deal with tracks
+    if isinstance(obj, Track):
+        return {**to_dict_orjson(obj = obj), "notes": {field: [getattr(note, field) for note in obj.notes] for field in NOTE_FIELDS}}
+
+    # deal with everything else
+    return to_dict_orjson(obj = obj)
+
+def is_empty(value) -> bool:
+    """Return whether a value is None or an empty container (for pretty printing)."""
+    return (value is None) or (isinstance(value, (list, tuple, dict)) and (len(value) == 0))
+
+def strip_empty(d: dict) -> dict:
+    """Recursively remove None values and empty containers from a dictionary (for pretty printing)."""
+    return {key: (strip_empty(d = value) if isinstance(value, dict) else value) for key, value in d.items() if not is_empty(value = value)}
+
+# yaml dumper for printing that leaves out empty values altogether
+class YamlDumperWithoutEmpty(YAML_DUMPER):
+    pass
+YamlDumperWithoutEmpty.add_multi_representer(muspy.base.Base, lambda dumper, data: dumper.represent_mapping(f"tag:yaml.org,2002:python/object:{data.__class__.__module__}.{data.__class__.__name__}", strip_empty(d = vars(data))))
 
 ##################################################
 
@@ -166,7 +227,7 @@ class MusicRender(muspy.music.Music):
         output_filepath : str, optional
             If provided, outputs the yaml to the provided filepath. If not provided, prints to stdout
         remove_empty_lines : bool, optional, default: True
-            Whether or not to remove empty lines from the output
+            Whether or not to leave out empty (None or empty list) values from the output
 
         """
 
@@ -174,31 +235,26 @@ class MusicRender(muspy.music.Music):
         output = ""
         divider = "".join(("=" for _ in range(100))) + "\n" # divider
 
+        # empty values are never written in the first place, rather than filtering out lines containing "null" or "[]" afterwards
+        dumper = YamlDumperWithoutEmpty if remove_empty_lines else YAML_DUMPER
+
         # loop through fields to maintain order
-        for attribute in self.__dict__.keys():
+        for attribute, value in self.__dict__.items():
             
             output += divider
 
             # yaml dump normally
             if attribute != "resolution":
                 output += f"{attribute.upper()}\n"
-                output += sub(pattern = "!!python/object:.*classes.", repl = "", string = yaml.dump(data = self.__dict__[attribute]))
+                if not (remove_empty_lines and is_empty(value = value)):
+                    value_dumper = yaml.Dumper if (type(value) in BASE_TYPES) else dumper # libyaml leaves out the "..." end marker after a lone scalar, so keep the python dumper for those (cheap anyways)
+                    output += YAML_PYTHON_OBJECT_TAG_PATTERN.sub(repl = "", string = yaml.dump(data = value, Dumper = value_dumper))
 
             # resolution is special, since it's just a number
             else:
-                output += f"{attribute.upper()}: {self.__dict__[attribute]}\n"
+                output += f"{attribute.upper()}: {value}\n"
         output += divider
 
-        # remove_empty_lines
-        if remove_empty_lines:
-
-            output_filtered = "" # instantiate
-            for line in output.splitlines():
-                if not any((hitword in line for hitword in ("null", "[]"))): # if line contains null or empty list
-                    output_filtered += line + "\n"
-
-            output = output_filtered # reset output
-                
         # output
         if output_filepath:
             with open(output_filepath, "w") as file:
@@ -235,6 +291,12 @@ class MusicRender(muspy.music.Music):
         temporal_features.insert(1, Tempo(time = 0, measure = 1, qpm = 60)) # add default starting tempo
         temporal_features.append(TimeSignature(time = self.song_length, measure = 1, numerator = 4, denominator = 4)) # add default ending time_signature
 
+        # precompute the values needed from each temporal feature, so that the loop is purely arithmetic
+        times = [temporal_feature.time for temporal_feature in temporal_features]
+        kinds = [temporal_feature._KIND for temporal_feature in temporal_features]
+        quarters_per_minute = [(temporal_feature.qpm + DIVIDE_BY_ZERO_CONSTANT) if (kind == TEMPO_KIND) else None for temporal_feature, kind in zip(temporal_features, kinds)] # to avoid divide by zero error
+        time_signature_denominators = [(temporal_feature.denominator + DIVIDE_BY_ZERO_CONSTANT) if (kind == TIME_SIGNATURE_KIND) else None for temporal_feature, kind in zip(temporal_features, kinds)]
+
         # initialize some variables
         time_signature_idx = 0 # keep track of most recent time_signature
         tempo_idx = 1 # keep track of most recent tempo
@@ -243,20 +305,18 @@ class MusicRender(muspy.music.Music):
         time = 0.0 # running count of time elapsed
 
         # loop through temporal features
-        for i in range(2, len(temporal_features)):
+        for i in range(2, len(times)):
 
             # check if we reached time_steps
-            if time_steps <= temporal_features[i].time:
+            if time_steps <= times[i]:
                 end = time_steps
                 reached_time_steps = True # update boolean flag
             else:
-                end = temporal_features[i].time
+                end = times[i]
             period_length = end - most_recent_time_step
             
             # update time elapsed
-            quarters_per_minute_at_tempo = temporal_features[tempo_idx].qpm + DIVIDE_BY_ZERO_CONSTANT # to avoid divide by zero error
-            time_signature_denominator = temporal_features[time_signature_idx].denominator + DIVIDE_BY_ZERO_CONSTANT
-            time += (period_length / self.resolution) * (60 / quarters_per_minute_at_tempo) * (4 / time_signature_denominator)
+            time += (period_length / self.resolution) * (60 / quarters_per_minute[tempo_idx]) * (4 / time_signature_denominators[time_signature_idx])
 
             # break if reached time steps
             if reached_time_steps:
@@ -266,9 +326,10 @@ class MusicRender(muspy.music.Music):
             most_recent_time_step += period_length
 
             # check for temporal feature type
-            if isinstance(temporal_features[i], TimeSignature):
+            kind = kinds[i]
+            if kind == TIME_SIGNATURE_KIND:
                 time_signature_idx = i
-            elif isinstance(temporal_features[i], Tempo):
+            elif kind == TEMPO_KIND:
                 tempo_idx = i
 
         # return end time if we never reached time steps
@@ -462,18 +523,27 @@ class MusicRender(muspy.music.Music):
 
     def _get_max_time_obj_helper(self, obj) -> int:
         end_time = obj.time
-        if hasattr(obj, "duration"): # look for duration at top-level
+        if has_attribute(obj = obj, attribute = "duration"): # look for duration at top-level
             end_time += obj.duration
-        elif hasattr(obj, "annotation"): # look for duration
-            if hasattr(obj.annotation, "duration"): # within an annotation
-                end_time += obj.annotation.duration
+        elif has_attribute(obj = obj, attribute = "annotation") and has_attribute(obj = obj.annotation, attribute = "duration"): # look for duration within an annotation
+            end_time += obj.annotation.duration
         return end_time
     def get_song_length(self) -> int:
         """Return the length of the song in time steps."""
-        all_objs = self.tempos + self.key_signatures + self.time_signatures + self.beats + self.barlines + self.lyrics + self.annotations + sum([track.notes + track.annotations + track.lyrics for track in self.tracks], [])
-        if len(all_objs) > 0:
-            max_time_obj = max(all_objs, key = self._get_max_time_obj_helper)
-            max_time = max_time_obj.time + (max_time_obj.duration if hasattr(max_time_obj, "duration") else 0) # + self.resolution # add a quarter note at the end for buffer
+        all_objs = chain(self.tempos, self.key_signatures, self.time_signatures, self.beats, self.barlines, self.lyrics, self.annotations, chain.from_iterable((chain(track.notes, track.annotations, track.lyrics) for track in self.tracks)))
+        max_time, has_duration, has_annotation = None, HAS_ATTRIBUTE["duration"], HAS_ATTRIBUTE["annotation"] # local aliases
+        for obj in all_objs: # same as _get_max_time_obj_helper(), but with the memoized lookups inlined
+            end_time = obj.time
+            obj_type = type(obj)
+            if has_duration.get(obj_type) or ((obj_type not in has_duration) and has_attribute(obj = obj, attribute = "duration")): # look for duration at top-level
+                end_time += obj.duration
+            elif has_annotation.get(obj_type) or ((obj_type not in has_annotation) and has_attribute(obj = obj, attribute = "annotation")): # look for duration within an annotation
+                annotation_type = type(obj.annotation)
+                if has_duration.get(annotation_type) or ((annotation_type not in has_duration) and has_attribute(obj = obj.annotation, attribute = "duration")):
+                    end_time += obj.annotation.duration
+            if (max_time is None) or (end_time > max_time):
+                max_time = end_time
+        if max_time is not None:
             max_time += 1 # is trivial in the grand scheme, but for muspy stuff
         else:
             max_time = 0
@@ -493,16 +563,16 @@ class MusicRender(muspy.music.Music):
     ##################################################
 
     def save(self, path: str, kind: str = None, ensure_ascii: bool = False, compressed: bool = None, **kwargs) -> str:
-        """Save a Music object to a JSON or YAML file.
+        """Save a Music object to a JSON, YAML, or MessagePack file.
 
         Parameters
         ----------
         path : str
             Path to save the JSON data.
         compressed : bool, optional
-            Whether to save as a compressed JSON or YAML file (`.json.gz` or `.yaml.gz`). Has no effect when `path` is a file object. Defaults to infer from the extension (`.gz`).
+            Whether to save as a compressed JSON, YAML, or MessagePack file (`.json.gz`, `.yaml.gz`, or `.msgpack.gz`). Has no effect when `path` is a file object. Defaults to infer from the extension (`.gz`).
         **kwargs
-            Keyword arguments to pass to :py:func:`json.dumps` or `yaml.dump`.
+            Keyword arguments to pass to :py:func:`json.dump` or `yaml.safe_dump`.
 
         Returns
         -------
@@ -511,7 +581,7 @@ class MusicRender(muspy.music.Music):
 
         Notes
         -----
-        When a path is given, use UTF-8 encoding and gzip compression if `compressed=True`.
+        When a path is given, use UTF-8 encoding and gzip compression if `compressed=True`. JSON is written with orjson unless `ensure_ascii=True` or keyword arguments are provided, in which case :py:func:`json.dump` is used.
 
         """
 
@@ -520,11 +590,45 @@ class MusicRender(muspy.music.Music):
                 kind = "json"
             elif path.endswith(".yaml"):
                 kind = "yaml"
+            elif path.endswith(".msgpack"):
+                kind = "msgpack"
             else:
-                raise ValueError("Cannot infer file format from the extension (expect JSON or YAML).")
+                raise ValueError("Cannot infer file format from the extension (expect JSON, YAML, or MessagePack).")
         else:
             kind = kind.lower()
         
+        # determine if compression is inferred
+        if compressed is None:
+            compressed = str(path).lower().endswith(".gz")
+        if compressed:
+            path += "" if path.lower().endswith(".gz") else ".gz" # make sure it ends with gz
+        opener = gzip.open if compressed else open
+
+        # orjson and msgpack serialize built-in types themselves, calling a `default` function for our objects; orjson cannot ensure ascii or take json.dump() keyword arguments, but is much faster otherwise
+        if (kind == "msgpack") or ((kind == "json") and (not ensure_ascii) and (len(kwargs) == 0)):
+            data = {
+                "metadata": self.metadata,
+                "resolution": self.resolution,
+                "tempos": self.tempos,
+                "key_signatures": self.key_signatures,
+                "time_signatures": self.time_signatures,
+                "beats": self.beats,
+                "barlines": self.barlines,
+                "lyrics": self.lyrics,
+                "annotations": self.annotations,
+                "tracks": self.tracks,
+                "song_length": self.song_length,
+                "infer_velocity": self.infer_velocity,
+                "absolute_time": self.absolute_time,
+            }
+            if kind == "json":
+                data = orjson.dumps(data, default = to_dict_orjson, option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+            else:
+                data = msgpack.packb(data, default = to_dict_msgpack, use_bin_type = True)
+            with opener(path, "wb") as file:
+                file.write(data)
+            return path
+
         # convert self to dictionary
         data = {
             "metadata": to_dict(obj = self.metadata),
@@ -542,31 +646,19 @@ class MusicRender(muspy.music.Music):
             "absolute_time": self.absolute_time,
         }
 
-        # convert dictionary to json obj
-        if kind == "json":
-            data = json.dumps(obj = data, ensure_ascii = ensure_ascii, **kwargs)
-        else:
-            data = yaml.safe_dump(data = data, allow_unicode = ensure_ascii, **kwargs)
-
-        # determine if compression is inferred
-        if compressed is None:
-            compressed = str(path).lower().endswith(".gz")
+        # stream the dictionary straight into the (possibly compressed) file, rather than building the entire string in memory first
+        with opener(path, "wt", encoding = "utf-8") as file:
+            if kind == "json":
+                json.dump(obj = data, fp = file, ensure_ascii = ensure_ascii, **kwargs)
+            else:
+                yaml.safe_dump(data = data, stream = file, allow_unicode = ensure_ascii, **kwargs)
 
-        # either compress or not
-        if compressed:
-            path += "" if path.lower().endswith(".gz") else ".gz" # make sure it ends with gz
-            with gzip.open(path, "wt", encoding = "utf-8") as file:
-                file.write(data)
-        else:
-            with open(path, "w", encoding = "utf-8") as file:
-                file.write(data)
-        
         # return the path to which it was saved
         return path
 
     # wraps the main load() function into an instance method
     def load(self, path: str, kind: str = None):
-        """Load a Music object from a JSON or YAML file.
+        """Load a Music object from a JSON, YAML, or MessagePack file.
 
         Parameters
         ----------
@@ -580,8 +672,10 @@ class MusicRender(muspy.music.Music):
                 kind = "json"
             elif path.endswith((".yaml", ".yml")):
                 kind = "yaml"
+            elif path.endswith((".msgpack",)):
+                kind = "msgpack"
             else:
-                raise ValueError("Cannot infer file format from the extension (expect JSON or YAML).")
+                raise ValueError("Cannot infer file format from the extension (expect JSON, YAML, or MessagePack).")
         else:
             kind = kind.lower()
         music = load(path = path, kind = kind)
@@ -616,6 +710,10 @@ class MusicRender(muspy.music.Music):
             Time step at which to trim. Anything before this timestep will be removed.
         end : int, default: song_length
             Time step at which to trim. Anything after this timestep will be removed.
+
+        Note
+        ----
+        Since nothing is left past `end`, `song_length` is capped at `end` rather than recomputed with `get_song_length()`, which would require another pass over every object.
         """
 
         # deal with start and end arguments
@@ -662,8 +760,8 @@ class MusicRender(muspy.music.Music):
                     if (annotation.time + annotation.annotation.duration) > end: # if end of annotation is past the end
                         self.tracks[i].annotations[j].annotation.duration = end - annotation.time # cut duration off duration at end
         
-        # update song_length
-        self.song_length = self.get_song_length()
+        # update song_length; trimming bounds the end of the song at `end`
+        self.song_length = min(self.song_length, end)
 
     ##################################################
 
@@ -694,8 +792,10 @@ class MusicRender(muspy.music.Music):
                 kind = "json"
             elif path.lower().endswith((".yaml", ".yml")):
                 kind = "yaml"
+            elif path.lower().endswith((".msgpack",)):
+                kind = "msgpack"
             else:
-                raise ValueError("Cannot infer file format from the extension (expect MIDI, MusicXML, WAV, AIFF, FLAC, OGA, JSON, or YAML).")
+                raise ValueError("Cannot infer file format from the extension (expect MIDI, MusicXML, WAV, AIFF, FLAC, OGA, JSON, YAML, or MessagePack).")
         
         # output
         if kind.lower() == "audio": # write audio
@@ -709,10 +809,10 @@ class MusicRender(muspy.music.Music):
             else:
                 music = self
             return write_musicxml(path = path, music = music, **kwargs)
-        elif kind.lower() in ("json", "yaml"):
+        elif kind.lower() in ("json", "yaml", "msgpack"):
             return self.save(path = path, kind = kind)
         else:
-            raise ValueError(f"Expect `kind` to be 'midi', 'musicxml', 'audio', or 'json', but got : {kind}.")
+            raise ValueError(f"Expect `kind` to be 'midi', 'musicxml', 'audio', 'json', 'yaml', or 'msgpack', but got : {kind}.")
 
     ##################################################
         
@@ -793,6 +893,12 @@ class MusicRender(muspy.music.Music):
 # LOAD A BETTERMUSIC OBJECT FROM JSON FILE
 ##################################################
 
+# helper function to load the points of a bend or tremolo bar
+def load_points(points: List[dict]) -> List[Point]:
+    """Return a list of Point objects given a list of point dictionaries. For loading from .json."""
+    _Point = Point # local alias
+    return [_Point(time = point["time"], pitch = point["pitch"], vibrato = point["vibrato"]) for point in points] # Point already casts its fields to int
+
 # helper function to load the correct annotation object
 def load_annotation(annotation: dict):
     """Return an expressive feature object given an annotation dictionary. For loading from .json."""
@@ -825,9 +931,9 @@ def load_annotation(annotation: dict):
         case "Symbol":
             return Symbol(subtype = str(annotation["subtype"]))
         case "Bend":
-            return Bend(points = [Point(time = int(point["time"]), pitch = int(point["pitch"]), vibrato = int(point["vibrato"])) for point in annotation["points"]])
+            return Bend(points = load_points(points = annotation["points"]))
         case "TremoloBar":
-            return TremoloBar(points = [Point(time = int(point["time"]), pitch = int(point["pitch"]), vibrato = int(point["vibrato"])) for point in annotation["points"]])
+            return TremoloBar(points = load_points(points = annotation["points"]))
         case "Spanner":
             return Spanner(duration = int(annotation["duration"]))
         case "SubtypeSpanner":
@@ -853,9 +959,60 @@ def load_annotation(annotation: dict):
         case _:
             raise KeyError("Unknown annotation type.")
 
+# helper functions to cast a value that could be None
+def optional_int(value) -> int:
+    """Cast a value to an int, unless it is None. For loading from .json."""
+    return None if value is None else int(value)
+def optional_float(value) -> float:
+    """Cast a value to a float, unless it is None. For loading from .json."""
+    return None if value is None else float(value)
+def optional_str(value) -> str:
+    """Cast a value to a str, unless it is None. For loading from .json."""
+    return None if value is None else str(value)
+def optional_bool(value) -> bool:
+    """Cast a value to a bool, unless it is None. For loading from .json."""
+    return None if value is None else bool(value)
+
+# helper function to extract a single field from a list of dictionaries
+def load_column(objs: List[dict], key: str, cast = optional_int) -> list:
+    """Return the values of `key` across a list of dictionaries (i.e. a column), cast with `cast`. For loading from .json."""
+    return list(map(cast, [obj.get(key) for obj in objs]))
+
+# helper functions to load notes, chords, and beats column-wise (struct-of-arrays), since there can be very many of them
+def load_notes(notes: Union[List[dict], dict]) -> List[Note]:
+    """Return a list of Note objects given a list of note dictionaries, or a dictionary of note columns (from .msgpack). For loading from .json."""
+    _Note = Note # local alias
+    if not isinstance(notes, dict): # convert to columns
+        notes = {field: [note.get(field) for note in notes] for field in NOTE_FIELDS}
+    times = list(map(int, notes["time"]))
+    pitches = list(map(optional_int, notes["pitch"]))
+    durations = list(map(optional_int, notes["duration"]))
+    velocities = list(map(optional_int, notes["velocity"]))
+    pitches_str = list(map(optional_str, notes["pitch_str"]))
+    are_grace = list(map(optional_bool, notes["is_grace"]))
+    measures = list(map(optional_int, notes["measure"]))
+    return [_Note(time = time, pitch = pitch, duration = duration, velocity = velocity, pitch_str = pitch_str, is_grace = is_grace, measure = measure) for time, pitch, duration, velocity, pitch_str, is_grace, measure in zip(times, pitches, durations, velocities, pitches_str, are_grace, measures)]
+def load_chords(chords: List[dict]) -> List[Chord]:
+    """Return a list of Chord objects given a list of chord dictionaries. For loading from .json."""
+    _Chord = Chord # local alias
+    times = list(map(int, [chord["time"] for chord in chords]))
+    pitches = [list(map(int, chord_pitches)) if chord_pitches is not None else None for chord_pitches in [chord["pitches"] for chord in chords]]
+    durations = load_column(objs = chords, key = "duration", cast = optional_int)
+    velocities = load_column(objs = chords, key = "velocity", cast = optional_int)
+    pitches_str = [list(map(str, chord_pitches_str)) if chord_pitches_str is not None else None for chord_pitches_str in [chord["pitches_str"] for chord in chords]]
+    measures = load_column(objs = chords, key = "measure", cast = optional_int)
+    return [_Chord(time = time, pitches = chord_pitches, duration = duration, velocity = velocity, pitches_str = chord_pitches_str, measure = measure) for time, chord_pitches, duration, velocity, chord_pitches_str, measure in zip(times, pitches, durations, velocities, pitches_str, measures)]
+def load_beats(beats: List[dict]) -> List[Beat]:
+    """Return a list of Beat objects given a list of beat dictionaries. For loading from .json."""
+    _Beat = Beat # local alias
+    times = list(map(int, [beat["time"] for beat in beats]))
+    are_downbeat = load_column(objs = beats, key = "is_downbeat", cast = optional_bool)
+    measures = load_column(objs = beats, key = "measure", cast = optional_int)
+    return [_Beat(time = time, is_downbeat = is_downbeat, measure = measure) for time, is_downbeat, measure in zip(times, are_downbeat, measures)]
+
 
 def load(path: str, kind: str = None) -> MusicRender:
-    """Load a Music object from a JSON or YAML file.
+    """Load a Music object from a JSON, YAML, or MessagePack file.
 
     Parameters
     ----------
@@ -869,103 +1026,90 @@ def load(path: str, kind: str = None) -> MusicRender:
             kind = "json"
         elif (".yaml" in path) or (".yml" in path):
             kind = "yaml"
+        elif ".msgpack" in path:
+            kind = "msgpack"
         else:
-            raise ValueError("Cannot infer file format from the extension (expect JSON or YAML).")
+            raise ValueError("Cannot infer file format from the extension (expect JSON, YAML, or MessagePack).")
     else:
         kind = kind.lower()
-    loader = json.load if (kind == "json") else yaml.safe_load
 
     # if file is compressed
-    if path.lower().endswith(".gz"):
-        with gzip.open(path, "rt", encoding = "utf-8") as file:
-            data = loader(file)
+    opener = gzip.open if path.lower().endswith(".gz") else open
+    if kind == "json":
+        with opener(path, "rb") as file:
+            data = orjson.loads(file.read())
+    elif kind == "msgpack":
+        with opener(path, "rb") as file:
+            data = msgpack.unpackb(file.read(), raw = False, strict_map_key = False)
     else:
-        with open(path, "rt", encoding = "utf-8") as file:
-            data = loader(file)
+        with opener(path, "rt", encoding = "utf-8") as file:
+            data = yaml.safe_load(file)
 
     # extract info from nested dictionaries
+    metadata_dict = data["metadata"]
     metadata = Metadata(
-        schema_version = str(data["metadata"]["schema_version"]) if data["metadata"]["schema_version"] is not None else None,
-        title = str(data["metadata"]["title"]) if data["metadata"]["title"] is not None else None,
-        subtitle = str(data["metadata"]["subtitle"]) if data["metadata"]["subtitle"] is not None else None,
-        creators = data["metadata"]["creators"] if data["metadata"]["creators"] is not None else None,
-        copyright = str(data["metadata"]["copyright"]) if data["metadata"]["copyright"] is not None else None,
-        collection = str(data["metadata"]["collection"]) if data["metadata"]["collection"] is not None else None,
-        source_filename = str(data["metadata"]["source_filename"]) if data["metadata"]["source_filename"] is not None else None,
-        source_format = str(data["metadata"]["source_format"]) if data["metadata"]["source_format"] is not None else None
+        schema_version = optional_str(value = metadata_dict.get("schema_version")),
+        title = optional_str(value = metadata_dict.get("title")),
+        subtitle = optional_str(value = metadata_dict.get("subtitle")),
+        creators = metadata_dict.get("creators"),
+        copyright = optional_str(value = metadata_dict.get("copyright")),
+        collection = optional_str(value = metadata_dict.get("collection")),
+        source_filename = optional_str(value = metadata_dict.get("source_filename")),
+        source_format = optional_str(value = metadata_dict.get("source_format"))
     )
     tempos = [Tempo(
         time = int(tempo["time"]),
-        qpm = float(tempo["qpm"]) if tempo["qpm"] is not None else None,
-        text = str(tempo["text"]) if tempo["text"] is not None else None,
-        measure = int(tempo["measure"]) if tempo["measure"] is not None else None
+        qpm = optional_float(value = tempo.get("qpm")),
+        text = optional_str(value = tempo.get("text")),
+        measure = optional_int(value = tempo.get("measure"))
     ) for tempo in data["tempos"]]
     key_signatures = [KeySignature(
         time = int(key_signature["time"]),
-        root = int(key_signature["root"]) if key_signature["root"] is not None else None,
-        mode = str(key_signature["mode"]) if key_signature["mode"] is not None else None,
-        fifths = int(key_signature["fifths"]) if key_signature["fifths"] is not None else None,
-        root_str = str(key_signature["root_str"]) if key_signature["root_str"] is not None else None,
-        measure = int(key_signature["measure"]) if key_signature["measure"] is not None else None
+        root = optional_int(value = key_signature.get("root")),
+        mode = optional_str(value = key_signature.get("mode")),
+        fifths = optional_int(value = key_signature.get("fifths")),
+        root_str = optional_str(value = key_signature.get("root_str")),
+        measure = optional_int(value = key_signature.get("measure"))
     ) for key_signature in data["key_signatures"]]
     time_signatures = [TimeSignature(
         time = int(time_signature["time"]),
-        numerator = int(time_signature["numerator"]) if time_signature["numerator"] is not None else None,
-        denominator = int(time_signature["denominator"]) if time_signature["denominator"] is not None else None,
-        measure = int(time_signature["measure"]) if time_signature["measure"] is not None else None
+        numerator = optional_int(value = time_signature.get("numerator")),
+        denominator = optional_int(value = time_signature.get("denominator")),
+        measure = optional_int(value = time_signature.get("measure"))
     ) for time_signature in data["time_signatures"]]
-    beats = [Beat(
-        time = int(beat["time"]),
-        is_downbeat = bool(beat["is_downbeat"]) if beat["is_downbeat"] is not None else None,
-        measure = int(beat["measure"]) if beat["measure"] is not None else None
-    ) for beat in data["beats"]]
+    beats = load_beats(beats = data["beats"])
     barlines = [Barline(
         time = int(barline["time"]),
-        subtype = str(barline["subtype"]) if barline["subtype"] is not None else None,
-        measure = int(barline["measure"]) if barline["measure"] is not None else None
+        subtype = optional_str(value = barline.get("subtype")),
+        measure = optional_int(value = barline.get("measure"))
     ) for barline in data["barlines"]]
     lyrics = [Lyric(
         time = int(lyric["time"]),
-        lyric = str(lyric["lyric"]) if lyric["lyric"] is not None else None,
-        measure = int(lyric["measure"]) if lyric["measure"] is not None else None
+        lyric = optional_str(value = lyric.get("lyric")),
+        measure = optional_int(value = lyric.get("measure"))
     ) for lyric in data["lyrics"]]
     annotations = [Annotation(
         time = int(annotation["time"]),
         annotation = load_annotation(annotation = annotation["annotation"]) if annotation["annotation"] is not None else None,
-        measure = int(annotation["measure"]) if annotation["measure"] is not None else None,
-        group = str(annotation["group"]) if annotation["group"] is not None else None
+        measure = optional_int(value = annotation.get("measure")),
+        group = optional_str(value = annotation.get("group"))
     ) for annotation in data["annotations"]]
     tracks = [Track(
-        program = int(track["program"]) if track["program"] is not None else None,
-        is_drum = bool(track["is_drum"]) if track["is_drum"] is not None else None,
-        name = str(track["name"]) if track["name"] is not None else None,
-        notes = [Note(
-            time = int(note["time"]),
-            pitch = int(note["pitch"]) if note["pitch"] is not None else None,
-            duration = int(note["duration"]) if note["duration"] is not None else None,
-            velocity = int(note["velocity"]) if note["velocity"] is not None else None,
-            pitch_str = str(note["pitch_str"]) if note["pitch_str"] is not None else None,
-            is_grace = bool(note["is_grace"]) if note["is_grace"] is not None else None,
-            measure = int(note["measure"]) if note["measure"] is not None else None
-            ) for note in track["notes"]],
-        chords = [Chord(
-            time = int(chord["time"]),
-            pitches = [int(pitch) for pitch in chord["pitches"]] if chord["pitches"] is not None else None,
-            duration = int(chord["duration"]) if chord["duration"] is not None else None,
-            velocity = int(chord["velocity"]) if chord["velocity"] is not None else None,
-            pitches_str = [str(pitch_str) for pitch_str in chord["pitches_str"]] if chord["pitches_str"] is not None else None,
-            measure = int(chord["measure"]) if chord["measure"] is not None else None
-            ) for chord in track["chords"]],
+        program = optional_int(value = track.get("program")),
+        is_drum = optional_bool(value = track.get("is_drum")),
+        name = optional_str(value = track.get("name")),
+        notes = load_notes(notes = track["notes"]),
+        chords = load_chords(chords = track["chords"]),
         lyrics = [Lyric(
             time = int(lyric["time"]),
-            lyric = str(lyric["lyric"]) if lyric["lyric"] is not None else None,
-            measure = int(lyric["measure"]) if lyric["measure"] is not None else None
+            lyric = optional_str(value = lyric.get("lyric")),
+            measure = optional_int(value = lyric.get("measure"))
             ) for lyric in track["lyrics"]],
         annotations = [Annotation(
             time = int(annotation["time"]),
             annotation = load_annotation(annotation = annotation["annotation"]) if annotation["annotation"] is not None else None,
-            measure = int(annotation["measure"]) if annotation["measure"] is not None else None,
-            group = str(annotation["group"]) if annotation["group"] is not None else None
+            measure = optional_int(value = annotation.get("measure")),
+            group = optional_str(value = annotation.get("group"))
             ) for annotation in track["annotations"]]
     ) for track in data["tracks"]]
 
@@ -0,0 +1,74 @@
+# README
+# Phillip Long
+# October 15, 2026
+
+# tests for the MusicRender class
+
+# python /home/pnlong/model_musescore/reading/test_music.py
+
+
+# IMPORTS
+##################################################
+
+import unittest
+
+from os.path import dirname, realpath
+import sys
+sys.path.insert(0, dirname(realpath(__file__)))
+sys.path.insert(0, dirname(dirname(realpath(__file__))))
+
+import classes
+from reading import classes as reading_classes # the same classes, but under a different module name, as imported by modeling/representation.py
+from music import MusicRender
+
+##################################################
+
+
+# SONG LENGTH
+##################################################
+
+class TestSongLength(unittest.TestCase):
+
+    def get_song(self, module) -> MusicRender:
+        """Build a score out of the classes from the given module."""
+        return MusicRender(
+            tempos = [module.Tempo(time = 0, qpm = 100)],
+            beats = [module.Beat(time = time) for time in range(0, 48, 12)],
+            annotations = [module.Annotation(time = 5, annotation = module.TempoSpanner(duration = 900, subtype = "rit"))],
+            tracks = [module.Track(
+                notes = [module.Note(time = 10, pitch = 60, duration = 500), module.Note(time = 20, pitch = 62, duration = 10)],
+                annotations = [module.Annotation(time = 0, annotation = module.Dynamic(subtype = "f"))],
+            )],
+        )
+
+    def test_classes_are_distinct(self):
+        self.assertIsNot(classes.Note, reading_classes.Note)
+
+    def test_song_length(self):
+        for module in (classes, reading_classes):
+            with self.subTest(module = module.__name__):
+                self.assertEqual(self.get_song(module = module).get_song_length(), 906) # the tempo spanner ends last
+
+    def test_song_length_of_notes(self):
+        for module in (classes, reading_classes):
+            with self.subTest(module = module.__name__):
+                music = MusicRender(tracks = [module.Track(notes = [module.Note(time = 10, pitch = 60, duration = 500)])])
+                self.assertEqual(music.get_song_length(), 511)
+
+    def test_song_length_of_mixed_modules(self):
+        music = self.get_song(module = classes)
+        music.tracks.append(reading_classes.Track(notes = [reading_classes.Note(time = 1000, pitch = 60, duration = 24)]))
+        self.assertEqual(music.get_song_length(), 1025)
+
+    def test_helper_matches_song_length(self):
+        for module in (classes, reading_classes):
+            with self.subTest(module = module.__name__):
+                music = self.get_song(module = module)
+                objs = music.tempos + music.beats + music.annotations + music.tracks[0].notes + music.tracks[0].annotations
+                self.assertEqual(max(map(music._get_max_time_obj_helper, objs)) + 1, music.get_song_length())
+
+##################################################
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -16,7 +16,7 @@ import argparse
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-from re import sub
+import re
 import os
 from os.path import dirname, basename, exists
 from tqdm import tqdm
@@ -24,8 +24,12 @@ import multiprocessing
 from typing import List
 import torch
 import logging
+import faiss
 
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
 from sentence_transformers import SentenceTransformer
+from model2vec import StaticModel
 
 from os.path import dirname, realpath
 import sys
@@ -57,12 +61,24 @@ make_facet_for_table = lambda facet: "\\RaggedRight{\\textbf{" + "$\cap$".join(m
 # CONSTANTS
 ##################################################
 
-# default batch size for encoding song titles as sentence embeddings
-BATCH_SIZE = 32
+# default batch sizes for encoding song titles as sentence embeddings, on the gpu and on the cpu
+GPU_BATCH_SIZE = 256
+CPU_BATCH_SIZE = 64
+
+# sentence embedding model, and the int8-quantized ONNX export of it that we run on CPU
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+ONNX_QUANTIZED_FILE_NAME = "onnx/model_qint8_avx512_vnni.onnx"
+
+# static embedding model, which just averages token embeddings, and its default batch size
+STATIC_EMBEDDING_MODEL_NAME = "minishlab/potion-base-8M"
+STATIC_BATCH_SIZE = 4096
 
 # column names in dataset from which we can create a description of the song that can be used for deduplication
 DESCRIPTOR_COLUMNS = ["song_name", "title", "subtitle", "artist_name", "composer_name"]
 
+# characters to remove from song descriptors
+DESCRIPTOR_INVALID_CHARACTERS_PATTERN = re.compile(r'[^ \w0-9,.?!;:()&-]')
+
 # column names for how to determine the best version of a song
 BEST_VERSION_METRIC_COLUMNS = ["rating", "n_ratings", "n_notes", "n_tokens"]
 
@@ -72,8 +88,16 @@ OUTPUT_COLUMNS = ["path", "best_path", "is_best_path", "best_arrangement", "is_b
 # facets of the dataset
 FACETS = ["all", "rated", "deduplicated", "rated_deduplicated"]
 
+# default number of songs along each side of a tile of the similarity matrix that is calculated at once
+TILE_SIZE = 4096
+
 # minimum similarity (0 to 1) between two song titles for them to be considered duplicates
 SIMILARITY_THRESHOLD = 0.8
+COSINE_SIMILARITY_THRESHOLD = (2 * SIMILARITY_THRESHOLD) - 1 # the same threshold, but for cosine similarity (-1 to 1)
+
+# for approximate similarity search, the number of links per song in the HNSW graph, and the number of nearest neighbors searched for each song
+HNSW_N_LINKS = 32
+N_NEIGHBORS = 64
 
 # fraction difference in number of notes necessary for two songs when those songs have the same instrumentation to be considered 'unique' arrangements
 UNIQUENESS_DIFFERENTIATION_COLUMN = "n_notes"
@@ -85,44 +109,38 @@ UNIQUENESS_THRESHOLD = 0.05
 # FUNCTION THAT CREATES SONG DESCRIPTORS
 ##################################################
 
-def get_song_descriptor_from_index(i: int) -> str:
+def get_song_descriptors(data: pd.DataFrame) -> pd.Series:
     """
-    Given the index of a row in the dataset, generate a song 'descriptor'
+    Given the dataset, generate a song 'descriptor' for each row
     based off the songs title and composer, as well as any other relevant attributes.
     """
 
     # extract relevant attributes from the dataset, replacing NA values with empty strings
-    song_name, title, subtitle, artist_name, composer_name = dataset.loc[i, DESCRIPTOR_COLUMNS].fillna(value = "")
+    song_name, title, subtitle, artist_name, composer_name = (data[column].fillna(value = "").astype(str) for column in DESCRIPTOR_COLUMNS)
+    has_song_name, has_title, has_subtitle, has_artist_name, has_composer_name = (attribute.str.len() > 0 for attribute in (song_name, title, subtitle, artist_name, composer_name))
 
     # deal with song name
-    song = ""
-    if (song_name.lower() == title.lower()) or ((len(song_name) > 0) and (len(title) == 0)):
-        song = song_name
-    elif (len(song_name) > 0) and (len(title) > 0):
-        song = f"{song_name}, also known as {title}"
-    elif len(title) > 0:
-        song = title
-    if len(subtitle) > 0:
-        song += f": {subtitle}"
+    song = np.select(
+        condlist = [(song_name.str.lower() == title.str.lower()) | (has_song_name & ~has_title), has_song_name & has_title, has_title],
+        choicelist = [song_name, song_name + ", also known as " + title, title],
+        default = "")
+    song = pd.Series(data = song, index = data.index, dtype = object)
+    song = song.where(cond = ~has_subtitle, other = song + ": " + subtitle)
 
     # deal with artist name
-    artist = ""
-    if (len(artist_name) > 0) and (len(composer_name) > 0): # if both are defined
-        artist = f"{artist_name}, and composed by {composer_name}"
-    elif len(artist_name) > 0:
-        artist = artist_name
-    elif len(composer_name) > 0:
-        artist = composer_name
-
-    # create descriptor, while doing some string processing
-    descriptor = f"{song}; by {artist}"
-    if descriptor[-1] not in ".?!": # add punctuation to the end if there isn't any
-        descriptor += "."
-    descriptor = sub(pattern = r'[^ \w0-9,.?!;:()&-]', repl = " ", string = descriptor)
-    descriptor = " ".join(descriptor.split()) # remove wierd whitespace
-
-    # return the descriptor
-    return descriptor
+    artist = np.select(
+        condlist = [has_artist_name & has_composer_name, has_artist_name, has_composer_name], # if both are defined, then either
+        choicelist = [artist_name + ", and composed by " + composer_name, artist_name, composer_name],
+        default = "")
+
+    # create descriptors, while doing some string processing
+    descriptors = song + "; by " + artist
+    descriptors = descriptors.where(cond = descriptors.str[-1].isin(values = [".", "?", "!"]), other = descriptors + ".") # add punctuation to the end if there isn't any
+    descriptors = descriptors.str.replace(pat = DESCRIPTOR_INVALID_CHARACTERS_PATTERN, repl = " ", regex = True)
+    descriptors = descriptors.str.split().str.join(sep = " ") # remove wierd whitespace
+
+    # return the descriptors
+    return descriptors
 
 ##################################################
 
@@ -136,22 +154,16 @@ def choose_best_song_from_indicies(indicies: List[int]) -> int:
     from those indicies. Our definition of best is the song with the highest ratings.
     """
 
-    # default best index
-    best_index = indicies[0]
-
     # avoid unnecessary computations if possible
     if len(indicies) == 1: # if a song has no duplicates
-        return best_index # simply return that song's index
-    
-    # get all the duplicates in one data frame
-    duplicates = dataset.loc[indicies, BEST_VERSION_METRIC_COLUMNS]
+        return indicies[0] # simply return that song's index
 
-    # determine best version of song
-    duplicates = duplicates.sort_values(by = BEST_VERSION_METRIC_COLUMNS, axis = 0, ascending = False, na_position = "last", ignore_index = False)
-    best_index = duplicates.index[0] # the top index is the best index
+    # determine best version of song; sort by each metric in descending order with missing values last, where the stable sort breaks ties by the earliest index
+    indicies = np.asarray(indicies)
+    best_index = indicies[np.lexsort(keys = -best_version_metrics[indicies].T[::-1])[0]] # the top index is the best index
 
     # return the best index
-    return best_index
+    return int(best_index)
 
 ##################################################
 
@@ -167,16 +179,17 @@ def choose_unique_arrangements_from_indicies(indicies: List[int]) -> pd.DataFram
     # get subset of dataset
     duplicates = dataset.loc[indicies]
 
-    # get all unique instrumentations of a song
-    instrumentations = pd.unique(values = duplicates["tracks"])
+    # group duplicates by their instrumentation, compared as integer codes
+    instrumentations = duplicates.groupby(by = track_codes[duplicates.index], sort = False)
 
     # avoid unnecessary computations if possible; if there are no duplicates or if each duplicate is a different instrumentation
-    if (len(duplicates) == 1) or (len(instrumentations) == len(duplicates)):
+    if (len(duplicates) == 1) or (instrumentations.ngroups == len(duplicates)):
         return duplicates
 
     # within each instrumentation choose the best arrangement
-    for instrumentation in instrumentations:
-        duplicates_instrumentation = duplicates[duplicates["tracks"] == instrumentation]
+    for track_code, duplicates_instrumentation in instrumentations:
+        if track_code == -1: # skip songs whose instrumentation is unknown
+            continue
 
         # find the best arrangement with this instrumentation
         if len(duplicates_instrumentation) > 1: # if there are duplicates within the instrumentation
@@ -189,14 +202,10 @@ def choose_unique_arrangements_from_indicies(indicies: List[int]) -> pd.DataFram
             
             # find unique arrangements within this instrumentation; group songs with similar number of tokens together
             duplicates_instrumentation = duplicates_instrumentation.sort_values(by = UNIQUENESS_DIFFERENTIATION_COLUMN, axis = 0, ascending = True, na_position = "last", ignore_index = False)
-            groups = [[duplicates_instrumentation.index[0]]]
-            for i in range(1, len(duplicates_instrumentation)):
-                i_previous, i_current = duplicates_instrumentation.index[(i - 1):(i + 1)]
-                value_previous, value_current = duplicates_instrumentation.loc[[i_previous, i_current], UNIQUENESS_DIFFERENTIATION_COLUMN]
-                if abs((2 * (value_current - value_previous)) / (value_current + value_previous)) <= UNIQUENESS_THRESHOLD:
-                    groups[-1].append(i_current)
-                else:
-                    groups.append([i_current])
+            values = duplicates_instrumentation[UNIQUENESS_DIFFERENTIATION_COLUMN].to_numpy(dtype = float)
+            with np.errstate(divide = "ignore", invalid = "ignore"):
+                is_new_group = ~(np.abs((2 * np.diff(values)) / (values[1:] + values[:-1])) <= UNIQUENESS_THRESHOLD) # a song starts a new group if it is too different from the previous one, or if that can't be determined
+            groups = np.split(ary = duplicates_instrumentation.index.to_numpy(), indices_or_sections = np.flatnonzero(is_new_group) + 1)
 
             # update data
             for group in groups:
@@ -212,6 +221,59 @@ def choose_unique_arrangements_from_indicies(indicies: List[int]) -> pd.DataFram
 ##################################################
 
 
+# FINDS ALL PAIRS OF SIMILAR SONGS
+##################################################
+
+def find_similar_pairs(embeddings: np.ndarray, tile_size: int, device: str) -> np.ndarray:
+    """
+    Given unit vector embeddings of each song, which stay on the cpu, return all pairs (i, j), where i < j, of similar songs.
+    The similarity matrix is calculated one square tile at a time, so only a couple tiles of embeddings are ever on the device.
+    """
+
+    # half precision matrix multiplication is only fast on the gpu
+    on_gpu = device.startswith("cuda")
+    dtype = torch.float16 if on_gpu else torch.float32
+
+    # helper function to move a tile of embeddings to the device, asynchronously on a separate stream if on the gpu
+    copy_stream = torch.cuda.Stream(device = device) if on_gpu else None
+    def load_tile(start: int) -> torch.Tensor:
+        tile = torch.from_numpy(np.array(embeddings[start:(start + tile_size)]))
+        if not on_gpu:
+            return tile.to(dtype = dtype)
+        with torch.cuda.stream(copy_stream):
+            return tile.pin_memory().to(device = device, dtype = dtype, non_blocking = True)
+
+    # helper function to wait for a tile to arrive on the device
+    def wait_for_tile(tile: torch.Tensor) -> torch.Tensor:
+        if on_gpu:
+            torch.cuda.current_stream(device = device).wait_stream(copy_stream)
+            tile.record_stream(torch.cuda.current_stream(device = device))
+        return tile
+
+    # calculate similarities, only for tiles on or above the diagonal, since similarity is symmetric
+    n_songs = len(embeddings)
+    buffer = torch.empty(size = (tile_size * tile_size,), dtype = dtype, device = device) # reused by every tile of similarities
+    pairs = []
+    for row_start in tqdm(iterable = range(0, n_songs, tile_size), desc = "Calculating Similarities", total = int(np.ceil(n_songs / tile_size))):
+        row_tile = wait_for_tile(tile = load_tile(start = row_start))
+        next_column_tile = row_tile
+        for column_start in range(row_start, n_songs, tile_size):
+            column_tile = wait_for_tile(tile = next_column_tile)
+            if (column_start + tile_size) < n_songs:
+                next_column_tile = load_tile(start = column_start + tile_size) # prefetch the next tile while this one is being used
+            similarities = buffer[:(len(row_tile) * len(column_tile))].view(len(row_tile), len(column_tile))
+            torch.mm(input = row_tile, mat2 = column_tile.T, out = similarities) # cosine similarities; embeddings are unit vectors, so these are just dot products
+            similarities.ge_(COSINE_SIMILARITY_THRESHOLD).triu_(diagonal = row_start - column_start + 1) # threshold in place, only keeping the upper triangle of the full matrix
+            rows, columns = torch.nonzero(input = similarities, as_tuple = True)
+            pairs.append(torch.stack(tensors = (rows + row_start, columns + column_start), dim = 1).cpu().numpy()) # nonzero already synchronizes, so moving pairs to the cpu right away costs nothing and keeps device memory bounded
+
+    # return pairs
+    pairs = np.concatenate(pairs, axis = 0)
+    return pairs
+
+##################################################
+
+
 # ARGUMENTS
 ##################################################
 
@@ -220,7 +282,10 @@ def parse_args(args = None, namespace = None):
     parser = argparse.ArgumentParser(prog = "Deduplicate", description = "Deduplicate songs in full dataset.")
     parser.add_argument("-df", "--dataset_filepath", default = f"{OUTPUT_DIR}/{DATASET_DIR_NAME}_full.csv", type = str, help = "Filepath to full dataset")
     parser.add_argument("-r", "--reset", action = "store_true", help = "Whether or not to recreate intermediate data tables")
-    parser.add_argument("-bs", "--batch_size", default = BATCH_SIZE, type = int, help = "Batch size")
+    parser.add_argument("-bs", "--batch_size", default = None, type = int, help = "Batch size (defaults to a size suited to the device)")
+    parser.add_argument("-ts", "--tile_size", default = TILE_SIZE, type = int, help = "Number of songs along each side of a tile of the similarity matrix to calculate at once")
+    parser.add_argument("-s", "--static", action = "store_true", help = "Whether or not to embed song descriptors with a (faster, but coarser) static embedding model instead of Sentence-BERT")
+    parser.add_argument("-a", "--approximate", action = "store_true", help = "Whether or not to find similar songs with an approximate nearest neighbor search instead of an exact one")
     parser.add_argument("-g", "--gpu", default = -1, type = int, help = "GPU number")
     parser.add_argument("-j", "--jobs", default = int(multiprocessing.cpu_count() / 4), type = int, help = "Number of Jobs")
     return parser.parse_args(args = args, namespace = namespace)
@@ -247,6 +312,8 @@ if __name__ == "__main__":
 
     # get device for gpu calculations
     device = f"cuda:{abs(args.gpu)}" if (torch.cuda.is_available() and args.gpu != -1) else "cpu"
+    if args.batch_size is None:
+        args.batch_size = STATIC_BATCH_SIZE if args.static else (GPU_BATCH_SIZE if device.startswith("cuda") else CPU_BATCH_SIZE)
 
     # set up logging
     logging.basicConfig(level = logging.INFO, format = "%(message)s")
@@ -256,8 +323,7 @@ if __name__ == "__main__":
     dataset = pd.read_csv(filepath_or_buffer = args.dataset_filepath, sep = ",", header = 0, index_col = False)
     
     # output filepaths
-    output_filepath_embeddings = f"{extra_output_dir}/embeddings.csv"
-    output_filepath_magnitudes = f"{extra_output_dir}/magnitudes.csv"
+    output_filepath_embeddings = f"{extra_output_dir}/embeddings{'_static' if args.static else ''}.npy"
     output_filepath = f"{output_dir}/{basename(dirname(args.dataset_filepath))}_deduplicated.csv"
     output_filepath_merged = f"{output_dir}/{basename(dirname(args.dataset_filepath))}.csv"
     plots_dir = f"{output_dir}/{PLOTS_DIR_NAME}"
@@ -269,8 +335,9 @@ if __name__ == "__main__":
 
     # USE EMBEDDING MODEL TO ENCODE SONG DESCRIPTORS
     ##################################################
-    # we use Sentence-BERT to embed song titles as vectors
+    # we use Sentence-BERT to embed song titles as vectors, or optionally a static model distilled from Sentence-BERT
     # https://github.com/UKPLab/sentence-transformers
+    # https://github.com/MinishLab/model2vec
 
     # do we need to generate the embeddings here?
     if (not exists(output_filepath_embeddings)) or args.reset:
@@ -278,57 +345,47 @@ if __name__ == "__main__":
         # update on progress
         logging.info("Computing Vector Embeddings.")
 
-        # load in Sentence-BERT model
-        model = SentenceTransformer(model_name_or_path = "all-MiniLM-L6-v2", device = device)
-
         # generate descriptors from which embeddings will be created
-        with multiprocessing.Pool(processes = args.jobs) as pool:
-            descriptors = list(pool.map(func = get_song_descriptor_from_index, iterable = dataset.index, chunksize = CHUNK_SIZE))
-
-        # generate embeddings for each song descriptor
-        embeddings = model.encode(sentences = descriptors,
-                                  batch_size = args.batch_size,
-                                  show_progress_bar = True,
-                                  output_value = "sentence_embedding",
-                                  device = device)
-        del descriptors, model # free up memory
-
-        # write embeddings to file for future use
-        pd.DataFrame(data = embeddings).to_csv(path_or_buf = output_filepath_embeddings, sep = ",", header = False, index = False, mode = "w")
-
-    # can we load them instead
-    elif not exists(output_filepath):
-
-        # update on progress
-        logging.info("Loading Vector Embeddings.")
-
-        # read in embeddings and turn into numpy array
-        embeddings = pd.read_csv(filepath_or_buffer = output_filepath_embeddings, sep = ",", header = None, index_col = False).values
+        descriptors = get_song_descriptors(data = dataset).tolist()
 
-    ##################################################
+        # generate embeddings for each song descriptor with a static model, which is much faster, but coarser
+        if args.static:
+            model = StaticModel.from_pretrained(path = STATIC_EMBEDDING_MODEL_NAME)
+            embeddings = model.encode(sentences = descriptors, batch_size = args.batch_size, show_progress_bar = True).astype(np.float32)
+            embeddings /= np.linalg.norm(embeddings, axis = 1, keepdims = True) # normalize
 
+        # generate embeddings for each song descriptor with Sentence-BERT
+        else:
 
-    # CALCULATE MAGNITUDES OF EMBEDDINGS
-    ##################################################
+            # load in Sentence-BERT model; in half precision on the gpu, otherwise quantized through ONNX Runtime
+            if device.startswith("cuda"):
+                model = SentenceTransformer(model_name_or_path = EMBEDDING_MODEL_NAME, device = device, model_kwargs = {"torch_dtype": torch.float16})
+            else:
+                model = SentenceTransformer(model_name_or_path = EMBEDDING_MODEL_NAME, device = device, backend = "onnx", model_kwargs = {"file_name": ONNX_QUANTIZED_FILE_NAME, "provider": "CPUExecutionProvider"})
+
+            # `encode` already sorts descriptors by length (and restores the original order afterwards), so batches carry little padding
+            embeddings = model.encode(sentences = descriptors,
+                                      batch_size = args.batch_size,
+                                      show_progress_bar = True,
+                                      output_value = "sentence_embedding",
+                                      convert_to_numpy = True,
+                                      normalize_embeddings = True,
+                                      device = device).astype(np.float32)
 
-    # do we need to generate the magnitudes here?
-    if (not exists(output_filepath_magnitudes)) or args.reset:
+        del descriptors, model # free up memory
 
-        # for calculating cosine similarity, calculate the magnitude of each song title vector embedding
-        with multiprocessing.Pool(processes = args.jobs) as pool:
-            magnitudes = np.array(list(pool.map(func = np.linalg.norm, iterable = tqdm(iterable = embeddings, desc = "Computing Embedding Magnitudes", total = len(embeddings)), chunksize = CHUNK_SIZE)))
-        
-        # write magnitudes to file for future use
-        pd.DataFrame(data = magnitudes).to_csv(path_or_buf = output_filepath_magnitudes, sep = ",", header = False, index = False, mode = "w")
+        # write embeddings to file for future use, in half precision to halve the file size
+        embeddings = embeddings.astype(np.float16)
+        np.save(file = output_filepath_embeddings, arr = embeddings)
 
     # can we load them instead
     elif not exists(output_filepath):
 
         # update on progress
-        logging.info("Loading Embedding Magnitudes.")
+        logging.info("Loading Vector Embeddings.")
 
-        # read in magnitudes and turn into numpy array
-        magnitudes = pd.read_csv(filepath_or_buffer = output_filepath_magnitudes, sep = ",", header = None, index_col = False)[0].values    
+        # memory-map embeddings, so they are only read in as they are needed
+        embeddings = np.load(file = output_filepath_embeddings, mmap_mode = "r")
 
     ##################################################
 
@@ -342,44 +399,34 @@ if __name__ == "__main__":
         # GROUP TOGETHER SIMILAR SONG NAMES INTO A DICTIONARY
         ##################################################
 
-        # move stuff to gpu for fast matrix operations
-        embeddings = torch.from_numpy(embeddings).to(device)
-        magnitudes = torch.from_numpy(magnitudes).to(device)
-        
+        n_songs = len(embeddings)
+
+        # find pairs of similar songs approximately, searching a graph-based index for each song's nearest neighbors
+        if args.approximate:
+            index = faiss.IndexHNSWFlat(embeddings.shape[1], HNSW_N_LINKS, faiss.METRIC_INNER_PRODUCT) # inner products of unit vectors are cosine similarities
+            embeddings = np.ascontiguousarray(embeddings, dtype = np.float32)
+            index.add(embeddings)
+            similarities, neighbors = index.search(embeddings, N_NEIGHBORS)
+            rows = np.broadcast_to(np.arange(n_songs)[:, np.newaxis], shape = neighbors.shape)
+            is_similar = (similarities >= COSINE_SIMILARITY_THRESHOLD) & (neighbors >= 0) & (neighbors != rows) # missing neighbors are -1; keep pairs found from either song, since neighbor lists aren't symmetric
+            pairs = np.stack(arrays = (rows[is_similar], neighbors[is_similar]), axis = 1)
+            del index, similarities, neighbors, rows, is_similar # free up memory
+
+        # find all pairs of similar songs exactly, streaming tiles of embeddings to the gpu
+        else:
+            pairs = find_similar_pairs(embeddings = embeddings, tile_size = args.tile_size, device = device)
+        del embeddings # free up memory
+
+        # group duplicates together, where each group is a connected component of the graph whose edges are pairs of similar songs
+        adjacency = coo_matrix((np.ones(shape = len(pairs), dtype = bool), (pairs[:, 0], pairs[:, 1])), shape = (n_songs, n_songs))
+        n_groups, group_ids = connected_components(csgraph = adjacency, directed = False)
+
         # stores lists of indicies, where each list represents a song
-        songs = []
-        songs_already_grouped = set() # store indicies of songs that have already been placed in a group
-        
-        # group duplicates together, reading in similarities line by line
-        for i in tqdm(iterable = range(len(dataset) - 1), desc = "Grouping Duplicates Together", total = len(dataset) - 1):
-
-            # don't deal with songs that have already been grouped
-            if i in songs_already_grouped:
-                continue
-
-            # calculate similarities
-            similarities = torch.matmul(input = embeddings[(i + 1):], other = embeddings[i]) # calculate dot products (numerator of cosine similarity)
-            similarities = similarities / (magnitudes[(i + 1):] * magnitudes[i]) # calculate cosine similarities
-            similarities = (similarities + 1) / 2 # normalize
-
-            # create a song group
-            song = torch.where(similarities >= SIMILARITY_THRESHOLD)[0] + (i + 1) # get indicies of duplicates for the `i`th song, add `i` + 1 to account for the fact the matrix is a triangle
-            song = list(filter(lambda index: index not in songs_already_grouped, song.tolist())) # remove indicies that have already been grouped with another song; not needed anymore, as this is done in similarity function calculations
-            song.append(i) # a song is similar to itself
-
-            # add song group to lists
-            songs.append(song) # add song group to songs
-            songs_already_grouped.update(song) # all these indicies have already been grouped
-
-        # account for the last song, i.e. if it hasn't been grouped yet
-        last_song_index = len(dataset) - 1
-        if last_song_index not in songs_already_grouped:
-            song = [last_song_index]
-            songs.append(song)
-            songs_already_grouped.update(song)
-        
+        songs = np.split(ary = np.argsort(group_ids, kind = "stable"), indices_or_sections = np.cumsum(np.bincount(group_ids, minlength = n_groups))[:-1])
+        songs = [song.tolist() for song in songs]
+
         # free up memory
-        del similarities, song, songs_already_grouped, last_song_index
+        del pairs, adjacency, n_groups
 
         ##################################################
         
@@ -387,20 +434,20 @@ if __name__ == "__main__":
         # ASSEMBLE DEDUPLICATED DATASET
         ##################################################
 
+        # metrics for choosing the best version of a song, where missing values are the worst possible value
+        best_version_metrics = np.nan_to_num(dataset[BEST_VERSION_METRIC_COLUMNS].to_numpy(dtype = float), nan = -np.inf)
+
         # get deduplicated indicies
         logging.info("Choosing the Best Version of Each Song.") # update
-        with multiprocessing.Pool(processes = args.jobs) as pool:
-            deduplicated_indicies = list(pool.map(func = choose_best_song_from_indicies, iterable = songs, chunksize = CHUNK_SIZE))
+        deduplicated_indicies = [choose_best_song_from_indicies(indicies = song) for song in songs] # cheap enough that a process pool would only add pickling overhead
 
-        # dictionary mapping each path to its best version
-        path_to_best_path = dict()
-        for best_path, duplicate_path_indicies in zip(dataset.loc[deduplicated_indicies, "path"], songs):
-            path_to_best_path.update({dataset.at[i, "path"]: best_path for i in duplicate_path_indicies})
-        dataset["best_path"] = list(map(lambda path: path_to_best_path.get(path, None), dataset["path"]))
-        dataset["is_best_path"] = (dataset["path"] == dataset["best_path"])
+        # map each song to the best version in its group
+        best_indicies = np.asarray(deduplicated_indicies)[group_ids]
+        dataset["best_path"] = dataset["path"].to_numpy()[best_indicies]
+        dataset["is_best_path"] = (np.arange(len(dataset)) == best_indicies)
 
         # free up memory
-        del deduplicated_indicies, path_to_best_path
+        del deduplicated_indicies, group_ids, best_indicies
 
         ##################################################
 
@@ -408,6 +455,9 @@ if __name__ == "__main__":
         # FOR EACH BEST PATH, THOUGH THE TITLE IS THE SAME, THERE COULD BE DIFFERENT ARRANGEMENTS
         ##################################################
 
+        # instrumentations as integer codes, where unknown instrumentations are -1
+        track_codes = pd.factorize(values = dataset["tracks"])[0]
+
         # set default values and a list of dataframes for each best path
         dataset["best_arrangement"] = dataset["path"]
         dataset["is_best_arrangement"] = True
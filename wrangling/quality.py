@@ -11,11 +11,12 @@
 
 import argparse
 import pandas as pd
-from typing import Union, List
-from utils import rep
+import numpy as np
+from typing import Union, List, Dict, Tuple
 from os.path import exists, dirname
 from os import mkdir
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
 import logging
 
 from os.path import dirname, realpath
@@ -39,23 +40,37 @@ PLOTS_DIR_NAME = "plots"
 
 RATING_ROUND_TO_THE_NEAREST = 0.05 # round to the nearest n-th to discretize ratings
 
+READ_CHUNK_SIZE = 1000000 # number of rows of the dataset to read in at once
+
+RASTERIZE_MIN_N_GROUPS = 256 # past this many groups, rasterized bars and error bars make for a smaller pdf than vector ones
+
 ##################################################
 
 
 # HELPER FUNCTIONS
 ##################################################
 
-def discretize_rating(rating: float) -> float:
+def discretize_rating(rating: Union[float, np.ndarray]) -> Union[float, np.ndarray]:
     """
-    Given the rating, convert into a more discrete version.
+    Given the rating (or an array of ratings), convert into a more discrete version.
     """
 
-    # deal with the no rating case
-    if rating == 0:
-        return 0.0
-    
-    # round to the nearest 1/5
-    return RATING_ROUND_TO_THE_NEAREST * round(rating / RATING_ROUND_TO_THE_NEAREST)
+    # round to the nearest 1/20; no rating (zero) stays zero
+    return RATING_ROUND_TO_THE_NEAREST * np.round(rating / RATING_ROUND_TO_THE_NEAREST)
+
+def bucket_rating(rating: np.ndarray) -> np.ndarray:
+    """
+    Given an array of ratings, convert into small integer buckets, which are faster to group by than the discretized ratings themselves.
+    """
+
+    return np.rint(rating / RATING_ROUND_TO_THE_NEAREST).astype(np.int16)
+
+def unbucket_rating(bucket: Union[int, np.ndarray, pd.Index]) -> Union[float, np.ndarray, pd.Index]:
+    """
+    Given rating bucket(s), convert back into the discretized rating(s).
+    """
+
+    return RATING_ROUND_TO_THE_NEAREST * bucket
 
 # make facet name fancy
 make_facet_name_fancy = lambda facet: facet.title().replace("_", " and ")
@@ -72,28 +87,131 @@ def group_by(df: pd.DataFrame, by: Union[str, List[str]]) -> pd.DataFrame:
     Function to help facilitate testing differences in data quality by various facets
     """
 
-    # only select relevant columns
+    # calculate moments of each group
     if isinstance(by, str):
         by = [by]
-    df = df[by + MMT_STATISTIC_COLUMNS]
+    moments = get_moments(df = df, by = by, masks = {"all": np.ones(shape = len(df), dtype = bool)})["all"]
 
-    # get sizes by group
-    sizes = df.groupby(by = by).size().to_frame(name = "n")
-    sizes["fraction"] = sizes["n"] / sum(sizes["n"])
+    # derive statistics from moments
+    df = summarize_moments(moments = moments, by = by)
+
+    # return df
+    return df
+
+##################################################
+
+
+# GROUP DATASET BY SOME FACET, A CHUNK AT A TIME
+##################################################
+
+# factorize the group keys of a chunk of the dataset
+def get_group_codes(df: pd.DataFrame, by: List[str]) -> Tuple[np.ndarray, np.ndarray, pd.Index]:
+    """
+    Function to get a mask of the rows whose group keys aren't missing, the integer group code of each of those rows, and the group keys of each code
+    """
+
+    # factorize each column of group keys, then combine them into a single integer code per group; rows with missing keys are dropped
+    column_codes, column_groups = zip(*(pd.factorize(values = df[column], sort = False) for column in by))
+    is_valid = np.all([codes >= 0 for codes in column_codes], axis = 0)
+    dimensions = [len(groups) for groups in column_groups]
+    codes, groups = pd.factorize(values = np.ravel_multi_index(multi_index = [codes[is_valid] for codes in column_codes], dims = dimensions), sort = False)
+
+    # the group keys of each code
+    groups = [column_groups[i].take(indices = column_group_codes) for i, column_group_codes in enumerate(np.unravel_index(indices = groups, shape = dimensions))]
+    groups = pd.MultiIndex.from_arrays(arrays = groups, names = by) if (len(by) > 1) else pd.Index(data = groups[0], name = by[0])
+
+    # return codes
+    return is_valid, codes, groups
+
+# calculate the moments of each group given group codes
+def group_by_codes(codes: np.ndarray, n_groups: int, values: np.ndarray, squared_values: np.ndarray, is_present: np.ndarray) -> dict:
+    """
+    Function to get, for each group, its size as well as the count, sum, and sum of squares of each MMT statistic (rows of `values`, where missing values are zero and not present).
+    """
+
+    # accumulate each moment in a single pass over the group codes; np.bincount is a much faster scatter-add than np.add.at, even for few groups
+    moments = dict()
+    for j, mmt_statistic_column in enumerate(MMT_STATISTIC_COLUMNS):
+        moments[(mmt_statistic_column, "count")] = np.bincount(codes, weights = is_present[j], minlength = n_groups).astype(np.int64)
+        moments[(mmt_statistic_column, "sum")] = np.bincount(codes, weights = values[j], minlength = n_groups)
+        moments[(mmt_statistic_column, "sum_of_squares")] = np.bincount(codes, weights = squared_values[j], minlength = n_groups)
+    moments[("n", "")] = np.bincount(codes, minlength = n_groups).astype(np.int64)
+
+    # return moments
+    return moments
+
+# calculate the moments of each group in a chunk of the dataset, from which statistics can be derived once all chunks are combined
+def get_moments(df: pd.DataFrame, by: List[str], masks: Dict[str, np.ndarray], dtype: type = np.float64) -> Dict[str, pd.DataFrame]:
+    """
+    Function to get, for each group within each subset (given by a boolean mask) of the dataset, its size as well as the count, sum, and sum of squares of each MMT statistic.
+    Group keys are only factorized once for all subsets. MMT statistics are reduced from arrays of the given `dtype`.
+    """
+
+    # factorize group keys
+    is_valid, codes, groups = get_group_codes(df = df, by = by)
+
+    # get relevant columns as one contiguous array per statistic, and their squares, once for all subsets
+    values = np.ascontiguousarray(df[MMT_STATISTIC_COLUMNS].to_numpy(dtype = dtype)[is_valid].T)
+    is_present = ~np.isnan(values)
+    values[~is_present] = 0
+    squared_values = values * values
+
+    # get moments by group for each subset, sharing the same group codes
+    moments = dict()
+    for key, mask in masks.items():
+        mask = mask[is_valid]
+        if mask.all(): # no need to copy anything for the full dataset
+            subset_moments = group_by_codes(codes = codes, n_groups = len(groups), values = values, squared_values = squared_values, is_present = is_present)
+        else: # only the rows of this subset
+            subset_moments = group_by_codes(codes = codes[mask], n_groups = len(groups), values = values[:, mask], squared_values = squared_values[:, mask], is_present = is_present[:, mask])
+        moments[key] = pd.DataFrame(data = subset_moments, index = groups)
+        moments[key] = moments[key][moments[key]["n"] > 0] # groups with no songs in this subset
+
+    # return moments
+    return moments
+
+# combine the moments from different chunks of the dataset
+def combine_moments(moments: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Function to add together the moments of the same groups across chunks
+    """
+
+    moments = pd.concat(objs = moments, axis = 0)
+    return moments.groupby(level = list(range(moments.index.nlevels)), observed = True).sum() # only groups that actually occur
+
+# derive statistics from the moments of each group
+def summarize_moments(moments: pd.DataFrame, by: List[str]) -> pd.DataFrame:
+    """
+    Function to calculate the same table as `group_by` from the moments of each group
+    """
+
+    # calculate means and standard errors of the means
+    df = dict()
+    for mmt_statistic_column in MMT_STATISTIC_COLUMNS:
+        count = moments[(mmt_statistic_column, "count")].to_numpy(dtype = np.float64)
+        with np.errstate(divide = "ignore", invalid = "ignore"): # groups with too few values are undefined
+            mean = moments[(mmt_statistic_column, "sum")].to_numpy() / count
+            variance = (moments[(mmt_statistic_column, "sum_of_squares")].to_numpy() - (count * (mean ** 2))) / (count - 1) # sample variance
+        df[(mmt_statistic_column, "mean")] = mean
+        df[(mmt_statistic_column, "sem")] = np.where(count > 1, np.sqrt(np.maximum(variance, 0) / count), np.nan) # undefined with fewer than two values
+    df = pd.DataFrame(data = df, index = moments.index)
 
-    # perform groupby
-    agg_dict = dict(zip(MMT_STATISTIC_COLUMNS, rep(x = ["mean", "sem"], times = len(MMT_STATISTIC_COLUMNS))))
-    df = df.groupby(by = by).agg(agg_dict)
+    # get sizes by group
+    sizes = moments["n"].to_frame(name = "n")
+    sizes["fraction"] = sizes["n"] / sizes["n"].sum()
     df[sizes.columns] = sizes
 
     # remove nested parts from index
     if (len(by) > 1):
-        by_string = ", ".join(by)
-        df[by_string] = list(map(lambda *args: ", ".join((str(arg) for arg in args[0])), df.index))
-        df = df.set_index(keys = by_string, drop = True)
+        index = df.index.get_level_values(level = 0).astype(str)
+        for level in range(1, len(by)):
+            index = index + ", " + df.index.get_level_values(level = level).astype(str)
+        df.index = pd.Index(data = index, name = ", ".join(by))
+    else:
+        df.index.name = by[0]
 
-    # sort indicies
-    df = df.sort_index(ascending = False)
+    # sort indicies, now that the index is one dimensional a single argsort suffices
+    df = df.iloc[np.argsort(df.index.to_numpy(), kind = "stable")[::-1]]
 
     # return df
     return df
@@ -132,19 +250,33 @@ if __name__ == "__main__":
     ##################################################
 
 
-    # LOAD DATASET, ARRANGE
+    # LOAD DATASET A CHUNK AT A TIME, ARRANGE
     ##################################################
 
-    # load in dataset
-    dataset = pd.read_csv(filepath_or_buffer = args.dataset_filepath, sep = ",", header = 0, index_col = False)
-
     # some value checking
+    columns = pd.read_csv(filepath_or_buffer = args.dataset_filepath, sep = ",", header = 0, index_col = False, nrows = 0).columns
     for by in args.by:
-        if by not in dataset.columns:
+        if by not in columns:
             raise KeyError(f"Invalid `by` argument \"{by}\". Must be a column in {args.dataset_filepath}.")
 
-    # deal with ratings column
-    dataset["rating"] = list(map(discretize_rating, dataset["rating"]))
+    # read in dataset a chunk at a time, only reading in the columns we need, with their types known in advance; ratings are group keys, so stay in double precision to land in the same buckets as rating.py
+    columns = set(args.by + MMT_STATISTIC_COLUMNS + ["rating", "facet:deduplicated"])
+    dtypes = {**{mmt_statistic_column: "float32" for mmt_statistic_column in MMT_STATISTIC_COLUMNS}, "rating": "float64", "facet:deduplicated": "bool"}
+    moments = {"all": [], "deduplicated": []}
+    for chunk in pd.read_csv(filepath_or_buffer = args.dataset_filepath, sep = ",", header = 0, index_col = False, usecols = lambda column: column in columns, dtype = dtypes, chunksize = READ_CHUNK_SIZE):
+
+        # string facets are cheaper to group by as categories
+        for by in args.by:
+            if pd.api.types.is_string_dtype(chunk[by]): # object or str dtype, depending on the pandas version
+                chunk[by] = chunk[by].astype("category")
+
+        # deal with ratings column, grouping by rating buckets instead of ratings
+        chunk["rating"] = bucket_rating(rating = chunk["rating"].to_numpy(dtype = float))
+
+        # accumulate moments of each group, for all songs and deduplicated songs
+        masks = {"all": np.ones(shape = len(chunk), dtype = bool), "deduplicated": chunk["facet:deduplicated"].to_numpy()}
+        for key, chunk_moments in get_moments(df = chunk, by = args.by, masks = masks, dtype = np.float32).items(): # the statistics are read in as single precision anyways
+            moments[key].append(chunk_moments)
 
     ##################################################
 
@@ -152,11 +284,21 @@ if __name__ == "__main__":
     # PRINT DATA TABLES
     ##################################################
 
+    # combine moments across chunks
+    moments = {key: combine_moments(moments = moments[key]) for key in moments.keys()}
+
+    # turn rating buckets back into ratings
+    if "rating" in args.by:
+        for key in moments.keys():
+            if isinstance(moments[key].index, pd.MultiIndex):
+                level = moments[key].index.names.index("rating")
+                moments[key].index = moments[key].index.set_levels(levels = unbucket_rating(bucket = moments[key].index.levels[level]), level = level)
+            else:
+                moments[key].index = unbucket_rating(bucket = moments[key].index)
+
     # group datasets by arguments
-    df = {
-        "all": group_by(df = dataset, by = args.by), # get all songs dataset
-        "deduplicated": group_by(df = dataset[dataset["facet:deduplicated"]], by = args.by), # get deduplicated dataset
-    }
+    df = {key: summarize_moments(moments = moments[key], by = args.by) for key in moments.keys()}
+    del moments # free up memory
 
     # output info
     for key in df.keys():
@@ -175,48 +317,55 @@ if __name__ == "__main__":
     facet_name_fancy = make_facet_name_fancy(facet = facet_name)
 
     # create plot
-    fig, axes = plt.subplot_mosaic(mosaic = [list(map(lambda column: f"{column}.{key}", MMT_STATISTIC_COLUMNS)) for key in df.keys()], constrained_layout = True, figsize = (12, 8))
+    fig, axes = plt.subplots(nrows = len(df), ncols = len(MMT_STATISTIC_COLUMNS), sharey = "row", squeeze = False, constrained_layout = True, figsize = (12, 8)) # each row shares its y-axis
     plt.set_loglevel("WARNING")
     fig.suptitle(facet_name_fancy)
     margin_proportion = 0.2 # what fraction of the range do we extend on both sides
+    statistics_fancy = {mmt_statistic_column: " ".join(mmt_statistic_column.split("_")).title() for mmt_statistic_column in MMT_STATISTIC_COLUMNS} # stylize the name of each mmt statistic once
 
-    for key in df.keys():
+    for i, key in enumerate(df.keys()):
 
         # get current data frame
         data = df[key]
         y_values = list(map(str, data.index))
+        y_positions = np.arange(len(y_values)) # where each categorical y value is placed
+        rasterized = (len(y_values) > RASTERIZE_MIN_N_GROUPS) # with many groups, store each artist as one image rather than every bar and segment
+
+        # x-axis limits for every statistic at once
+        means = data.loc[:, (MMT_STATISTIC_COLUMNS, "mean")].to_numpy(dtype = float)
+        sems = data.loc[:, (MMT_STATISTIC_COLUMNS, "sem")].to_numpy(dtype = float)
+        lo = np.fmin(np.nanmin(means - sems, axis = 0), np.nanmin(means, axis = 0)) # include the means themselves, since groups with a single song have no sem but are still plotted
+        hi = np.fmax(np.nanmax(means + sems, axis = 0), np.nanmax(means, axis = 0))
+        margin = margin_proportion * (hi - lo)
 
         # make plots
-        for mmt_statistic_column in MMT_STATISTIC_COLUMNS:
+        for j, mmt_statistic_column in enumerate(MMT_STATISTIC_COLUMNS):
 
             # variables
-            statistic_fancy = " ".join(mmt_statistic_column.split("_")).title() # stylize the name of the mmt statistic
-            column = f"{mmt_statistic_column}.{key}" # axes name
+            ax = axes[i, j] # current axes
 
             # little bit of data wrangling
             data_mmt_statistic = data[mmt_statistic_column]
             # data_mmt_statistic = data_mmt_statistic[~pd.isna(data_mmt_statistic["sem"])] # no na values
 
             # plot
-            axes[column].barh(y = y_values, width = data_mmt_statistic["mean"], color = "tab:blue")
-            axes[column].errorbar(x = data_mmt_statistic["mean"], y = y_values, xerr = data_mmt_statistic["sem"], fmt = "o", color = "tab:red")            
+            ax.barh(y = y_values, width = data_mmt_statistic["mean"], color = "tab:blue", rasterized = rasterized)
+            error_bars = np.stack(arrays = (np.column_stack((data_mmt_statistic["mean"] - data_mmt_statistic["sem"], y_positions)), np.column_stack((data_mmt_statistic["mean"] + data_mmt_statistic["sem"], y_positions))), axis = 1) # one segment per y value
+            ax.add_collection(LineCollection(segments = error_bars, colors = "tab:red", linewidths = 1.5, rasterized = rasterized))
+            ax.scatter(x = data_mmt_statistic["mean"], y = y_positions, s = 36, color = "tab:red", zorder = 2, rasterized = rasterized)
 
             # y and x axis labels
-            if mmt_statistic_column == MMT_STATISTIC_COLUMNS[0]:
-                axes[column].set_ylabel(facet_name_fancy)
-            else:
-                axes[column].sharey(other = axes[f"{MMT_STATISTIC_COLUMNS[0]}.{key}"])
-            axes[column].set_xlabel(statistic_fancy)
+            if j == 0:
+                ax.set_ylabel(facet_name_fancy)
+            ax.set_xlabel(statistics_fancy[mmt_statistic_column])
 
             # add margin
-            min_val, max_val = min(data_mmt_statistic["mean"] - data_mmt_statistic["sem"]), max(data_mmt_statistic["mean"] + data_mmt_statistic["sem"])
-            margin = margin_proportion * (max_val - min_val)
-            axes[column].set_xlim(left = min_val - margin, right = max_val + margin)
+            ax.set_xlim(left = lo[j] - margin[j], right = hi[j] + margin[j])
 
             # add title (if necessary) and grid
-            if mmt_statistic_column == MMT_STATISTIC_COLUMNS[1]:
-                axes[column].set_title(f"\n{key.title()} Songs\n", fontweight = "bold")
-            axes[column].grid()
+            if j == 1:
+                ax.set_title(f"\n{key.title()} Songs\n", fontweight = "bold")
+            ax.grid()
 
         # rotate y-axis ticks if necessary
         # if (facet_name.count(", ") > 0):
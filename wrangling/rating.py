@@ -81,7 +81,7 @@ if __name__ == "__main__":
     dataset = pd.read_csv(filepath_or_buffer = args.dataset_filepath, sep = ",", header = 0, index_col = False)
 
     # wrangle columns
-    dataset["rating"] = list(map(discretize_rating, dataset["rating"]))
+    dataset["rating"] = discretize_rating(rating = dataset["rating"].to_numpy(dtype = float))
     for mmt_statistic_column in MMT_STATISTIC_COLUMNS[1:]:
         dataset[mmt_statistic_column] *= 100 # convert consistency columns to percentages
 